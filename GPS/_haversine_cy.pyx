@@ -0,0 +1,34 @@
+# cython: language_level=3
+"""
+AOT-compiled scalar Haversine for SignalSight.
+
+Unlike the Numba kernels this has no first-call JIT warmup, which
+matters for short-lived scripts and the first GPS fix after boot.
+Build once on the target machine with:
+
+    python setup_haversine.py build_ext --inplace
+
+_haversine_nb picks the compiled module up automatically when present.
+"""
+
+from libc.math cimport sin, cos, sqrt, atan2
+
+cdef double EARTH_RADIUS_M = 6371008.8
+cdef double DEG2RAD = 0.017453292519943295
+
+
+cdef inline double _hav(double lat1, double lon1,
+                        double lat2, double lon2) nogil:
+    cdef double dlat = (lat2 - lat1) * DEG2RAD
+    cdef double dlon = (lon2 - lon1) * DEG2RAD
+    cdef double s1 = sin(dlat * 0.5)
+    cdef double s2 = sin(dlon * 0.5)
+    cdef double a = (s1 * s1 +
+                     cos(lat1 * DEG2RAD) * cos(lat2 * DEG2RAD) * s2 * s2)
+    return EARTH_RADIUS_M * 2.0 * atan2(sqrt(a), sqrt(1.0 - a))
+
+
+def haversine_scalar(double lat1, double lon1,
+                     double lat2, double lon2):
+    """Great-circle distance between two points in meters."""
+    return _hav(lat1, lon1, lat2, lon2)
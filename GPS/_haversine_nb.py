@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Haversine kernels for SignalSight, JIT-compiled with Numba when available.
+
+Numba removes the Python call overhead that dominates single-pair distance
+checks and releases the GIL inside the batch kernel. Numba is optional on
+the Pi, so everything here falls back to math/NumPy implementations with
+identical signatures when it is not installed.
+
+Author: SignalSight Team
+"""
+
+import math
+
+import numpy as np
+
+# Earth's radius in meters (WGS84 mean radius)
+EARTH_RADIUS_M = 6371008.8
+
+# Degrees-to-radians factor, hoisted so the kernels multiply by a constant
+# instead of calling math.radians() four times per distance
+_DEG2RAD = math.pi / 180.0
+
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+def _haversine_scalar_py(lat1: float, lon1: float,
+                         lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in meters."""
+    dlat = (lat2 - lat1) * _DEG2RAD
+    dlon = (lon2 - lon1) * _DEG2RAD
+
+    s1 = math.sin(dlat * 0.5)
+    s2 = math.sin(dlon * 0.5)
+    a = (s1 * s1 +
+         math.cos(lat1 * _DEG2RAD) * math.cos(lat2 * _DEG2RAD) * s2 * s2)
+
+    # atan2 form matches asin's accuracy without needing to clamp a <= 1
+    return EARTH_RADIUS_M * 2.0 * math.atan2(math.sqrt(a),
+                                             math.sqrt(1.0 - a))
+
+
+def _haversine_batch_py(lat0: float, lon0: float,
+                        lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distances from (lat0, lon0) to each (lats[i], lons[i]) in meters."""
+    dlat = np.radians(lats - lat0)
+    dlon = np.radians(lons - lon0)
+    a = (np.sin(dlat / 2) ** 2 +
+         math.cos(math.radians(lat0)) * np.cos(np.radians(lats)) *
+         np.sin(dlon / 2) ** 2)
+    return 2.0 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _equirectangular_batch_py(lat0: float, lon0: float,
+                              lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """
+    Flat-earth distance approximation, valid for small separations.
+
+    Error is below 0.1 m within ~2 km of the reference point, and the
+    formula avoids the sin/asin chain of the full Haversine.
+    """
+    cos_lat0 = math.cos(math.radians(lat0))
+    dx = np.radians(lons - lon0) * cos_lat0
+    dy = np.radians(lats - lat0)
+    return EARTH_RADIUS_M * np.hypot(dx, dy)
+
+
+if HAS_NUMBA:
+    haversine_scalar = njit(cache=True, fastmath=True)(_haversine_scalar_py)
+
+    @njit(cache=True, fastmath=True, parallel=True)
+    def haversine_batch(lat0, lon0, lats, lons):
+        """Distances from (lat0, lon0) to each (lats[i], lons[i]) in meters."""
+        n = lats.shape[0]
+        out = np.empty(n, dtype=np.float64)
+        cos_lat0 = math.cos(lat0 * _DEG2RAD)
+        for i in prange(n):
+            dlat = (lats[i] - lat0) * _DEG2RAD
+            dlon = (lons[i] - lon0) * _DEG2RAD
+            s1 = math.sin(dlat * 0.5)
+            s2 = math.sin(dlon * 0.5)
+            a = (s1 * s1 +
+                 cos_lat0 * math.cos(lats[i] * _DEG2RAD) * s2 * s2)
+            out[i] = EARTH_RADIUS_M * 2.0 * math.atan2(math.sqrt(a),
+                                                       math.sqrt(1.0 - a))
+        return out
+
+    @njit(cache=True, fastmath=True, parallel=True)
+    def equirectangular_batch(lat0, lon0, lats, lons):
+        """Flat-earth distance approximation, valid for small separations."""
+        n = lats.shape[0]
+        out = np.empty(n, dtype=np.float64)
+        cos_lat0 = math.cos(math.radians(lat0))
+        for i in prange(n):
+            dx = math.radians(lons[i] - lon0) * cos_lat0
+            dy = math.radians(lats[i] - lat0)
+            out[i] = EARTH_RADIUS_M * math.sqrt(dx * dx + dy * dy)
+        return out
+else:
+    haversine_scalar = _haversine_scalar_py
+    haversine_batch = _haversine_batch_py
+    equirectangular_batch = _equirectangular_batch_py
+
+    # Without Numba, optional C implementations can still take the hot
+    # loops out of the CPython interpreter. Both are soft dependencies:
+    # anything missing just leaves the math/NumPy versions in place.
+    try:
+        from cHaversine import haversine as _chaversine
+
+        def haversine_scalar(lat1: float, lon1: float,
+                             lat2: float, lon2: float) -> float:
+            """Great-circle distance between two points in meters."""
+            return _chaversine((lat1, lon1), (lat2, lon2))
+    except ImportError:
+        pass
+
+    try:
+        from sklearn.metrics.pairwise import haversine_distances \
+            as _sk_haversine
+
+        def haversine_batch(lat0: float, lon0: float,
+                            lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+            """Distances from (lat0, lon0) to each (lats[i], lons[i]) in meters."""
+            origin = np.radians([[lat0, lon0]])
+            points = np.radians(np.column_stack((lats, lons)))
+            return EARTH_RADIUS_M * _sk_haversine(origin, points)[0]
+    except ImportError:
+        pass
+
+# The AOT-compiled Cython extension wins for the scalar path regardless
+# of Numba: no JIT warmup on the first call and <200ns call overhead.
+# Built one-shot with: python setup_haversine.py build_ext --inplace
+try:
+    from _haversine_cy import haversine_scalar  # noqa: F811
+    HAS_CYTHON_EXT = True
+except ImportError:
+    HAS_CYTHON_EXT = False
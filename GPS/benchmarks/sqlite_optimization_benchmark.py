@@ -13,6 +13,7 @@ Requirements:
 """
 
 import sqlite3
+import math
 import time
 import argparse
 import sys
@@ -39,8 +40,8 @@ def get_optimized_connection(db_path: str) -> sqlite3.Connection:
     - WAL mode for concurrent reads
     - Increased cache size (8MB)
     - Memory-mapped I/O (64MB)
-    - Synchronous OFF
-    - Read uncommitted
+    - Synchronous NORMAL (safe under WAL, no per-commit fsync)
+    - Bounded WAL growth via autocheckpoint
     - Temp store in memory
     """
     conn = sqlite3.connect(db_path, check_same_thread=False)
@@ -49,8 +50,8 @@ def get_optimized_connection(db_path: str) -> sqlite3.Connection:
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA cache_size=-8000")  # 8MB
     conn.execute("PRAGMA mmap_size=67108864")  # 64MB
-    conn.execute("PRAGMA synchronous=OFF")
-    conn.execute("PRAGMA read_uncommitted=ON")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA wal_autocheckpoint=1000")
     conn.execute("PRAGMA temp_store=MEMORY")
 
     conn.row_factory = sqlite3.Row
@@ -136,6 +137,110 @@ def benchmark_queries(conn: sqlite3.Connection,
     }
 
 
+def _bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Initial bearing from point 1 to point 2 in degrees (0-360)."""
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlon = math.radians(lon2 - lon1)
+
+    x = math.sin(dlon) * math.cos(lat2_rad)
+    y = (math.cos(lat1_rad) * math.sin(lat2_rad) -
+         math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(dlon))
+
+    return (math.degrees(math.atan2(x, y)) + 360) % 360
+
+
+def benchmark_direction_filtering(conn: sqlite3.Connection,
+                                  test_locations: List[Tuple[float, float]],
+                                  headings: Tuple[float, ...] = (0, 90, 180, 270),
+                                  heading_cone: float = 90.0) -> dict:
+    """
+    Compare per-heading queries against a single batched scan.
+
+    The naive approach runs one bounding-box scan per heading and computes
+    bearings in Python for each result set. The batched approach registers
+    a bearing UDF on the connection, runs ONE scan that returns the bearing
+    alongside each row, and filters the cached rows per heading - one DB
+    hit instead of len(headings).
+
+    Args:
+        conn: Database connection
+        test_locations: List of (lat, lon) tuples to query
+        headings: Headings (degrees) to filter by
+        heading_cone: Maximum deviation from heading (degrees)
+
+    Returns:
+        Dictionary with naive and batched timings in milliseconds
+    """
+    conn.create_function("bearing", 4, _bearing, deterministic=True)
+
+    bbox_sql = """
+        SELECT id, lat, lon FROM traffic_lights
+        WHERE lat BETWEEN ? AND ?
+          AND lon BETWEEN ? AND ?
+    """
+    bearing_sql = """
+        SELECT id, lat, lon, bearing(?, ?, lat, lon) AS b
+        FROM traffic_lights
+        WHERE lat BETWEEN ? AND ?
+          AND lon BETWEEN ? AND ?
+    """
+
+    # Naive: one scan per heading, bearings computed row-by-row in Python
+    naive_start = time.perf_counter()
+    naive_counts = []
+    for lat, lon in test_locations:
+        bbox = (lat - 0.005, lat + 0.005, lon - 0.007, lon + 0.007)
+        for heading in headings:
+            rows = conn.execute(bbox_sql, bbox).fetchall()
+            matched = 0
+            for row in rows:
+                bearing = _bearing(lat, lon, row['lat'], row['lon'])
+                diff = abs(bearing - heading)
+                if diff > 180:
+                    diff = 360 - diff
+                if diff <= heading_cone:
+                    matched += 1
+            naive_counts.append(matched)
+    naive_ms = (time.perf_counter() - naive_start) * 1000
+
+    # Batched: one scan with the bearing UDF, reused for every heading
+    batched_start = time.perf_counter()
+    batched_counts = []
+    for lat, lon in test_locations:
+        params = (lat, lon, lat - 0.005, lat + 0.005, lon - 0.007, lon + 0.007)
+        rows = conn.execute(bearing_sql, params).fetchall()
+        bearings = [row['b'] for row in rows]
+        for heading in headings:
+            matched = sum(
+                1 for b in bearings
+                if abs(((b - heading + 540) % 360) - 180) <= heading_cone
+            )
+            batched_counts.append(matched)
+    batched_ms = (time.perf_counter() - batched_start) * 1000
+
+    if naive_counts != batched_counts:
+        print("WARNING: naive and batched direction filters disagree!")
+
+    return {
+        'headings': len(headings),
+        'naive_ms': naive_ms,
+        'batched_ms': batched_ms,
+        'speedup': naive_ms / batched_ms if batched_ms > 0 else 0.0,
+    }
+
+
+def print_direction_results(results: dict):
+    """Print direction-filtering benchmark results."""
+    print(f"\n{'=' * 60}")
+    print("DIRECTION FILTERING (bearing UDF batching)")
+    print(f"{'=' * 60}")
+    print(f"  Headings per query:   {results['headings']}")
+    print(f"  Per-heading scans:    {results['naive_ms']:.2f}ms")
+    print(f"  Single batched scan:  {results['batched_ms']:.2f}ms")
+    print(f"  Speedup Factor:       {results['speedup']:.2f}x faster")
+
+
 def print_results(label: str, results: dict):
     """Print benchmark results in a formatted table."""
     print(f"\n{'=' * 60}")
@@ -249,10 +354,17 @@ def main():
     opt_results = benchmark_queries(conn_opt, test_locations, args.iterations)
     conn_opt.close()
 
+    # Benchmark direction filtering (single scan + bearing UDF vs N scans)
+    print("Running DIRECTION FILTERING benchmark...")
+    conn_dir = get_optimized_connection(str(db_path))
+    direction_results = benchmark_direction_filtering(conn_dir, test_locations)
+    conn_dir.close()
+
     # Print results
     print_results("UNOPTIMIZED (Baseline)", unopt_results)
     print_results("OPTIMIZED (With PRAGMAs)", opt_results)
     print_comparison(unopt_results, opt_results)
+    print_direction_results(direction_results)
 
     print(f"\n{'=' * 60}")
     print("Benchmark complete!")
@@ -28,6 +28,7 @@ import sqlite3
 from pathlib import Path
 from typing import List, Tuple
 
+import numpy as np
 import requests
 import osmium
 
@@ -57,6 +58,9 @@ class TrafficSignalHandler(osmium.SimpleHandler):
     Osmium handler to extract traffic signal locations from OSM data.
 
     Extracts nodes tagged with highway=traffic_signals.
+
+    Fallback path for older pyosmium versions - newer versions use
+    _extract_parallel() which decodes PBF blocks on multiple threads.
     """
 
     def __init__(self):
@@ -123,42 +127,147 @@ def download_osm_data(url: str, output_path: Path, chunk_size: int = 8192) -> bo
         return False
 
 
-def extract_traffic_signals(pbf_path: Path) -> List[Tuple[float, float]]:
+def verify_pbf_checksum(url: str, pbf_path: Path) -> bool:
+    """
+    Verify a downloaded PBF against its Geofabrik .sha256 sidecar.
+
+    Uses hashlib.file_digest (Python 3.11+), which streams the file through
+    OpenSSL's hardware-accelerated SHA-256 path, with a chunked fallback
+    for older interpreters.
+
+    Args:
+        url: Download URL of the PBF (sidecar is fetched from url + '.sha256')
+        pbf_path: Path to the downloaded PBF file
+
+    Returns:
+        True if checksum matches (or sidecar is unavailable)
+    """
+    logger.info("Verifying PBF checksum...")
+
+    try:
+        response = requests.get(url + '.sha256', timeout=30)
+        response.raise_for_status()
+        expected = response.text.split()[0]
+    except (requests.RequestException, IndexError) as e:
+        logger.warning(f"Could not fetch checksum sidecar: {e}")
+        logger.warning("Skipping checksum verification")
+        return True
+
+    with open(pbf_path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            digest = hashlib.file_digest(f, 'sha256').hexdigest()
+        else:
+            sha256 = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+            digest = sha256.hexdigest()
+
+    if digest != expected:
+        logger.error("PBF checksum mismatch!")
+        logger.error(f"  Expected: {expected}")
+        logger.error(f"  Actual:   {digest}")
+        return False
+
+    logger.info("Checksum verified")
+    return True
+
+
+def _extract_parallel(pbf_path: Path) -> np.ndarray:
+    """
+    Extract traffic signals using osmium.FileProcessor (pyosmium >= 4.0).
+
+    FileProcessor decompresses and decodes PBF blocks on libosmium's worker
+    thread pool (the GIL is released in the C++ decoder), and the highway
+    key filter runs in C++ so only candidate nodes cross into Python.
+    Decompression is the compute-bound part of extraction, so this scales
+    near-linearly with core count.
+
+    Coordinates are accumulated in a preallocated float64 array (doubled
+    on growth) instead of a list of tuples - 16 bytes per point instead of
+    ~112 bytes of PyObject overhead.
+
+    Args:
+        pbf_path: Path to OSM PBF file
+
+    Returns:
+        (N, 2) float64 array of (lat, lon) coordinates
+    """
+    processor = osmium.FileProcessor(str(pbf_path), osmium.osm.NODE) \
+        .with_filter(osmium.filter.KeyFilter('highway'))
+
+    capacity = 1024
+    coords = np.empty((capacity, 2), dtype=np.float64)
+    count = 0
+
+    for node in processor:
+        if node.tags.get('highway') == 'traffic_signals':
+            if count == capacity:
+                grown = np.empty((capacity * 2, 2), dtype=np.float64)
+                grown[:capacity] = coords
+                coords = grown
+                capacity *= 2
+
+            coords[count, 0] = node.location.lat
+            coords[count, 1] = node.location.lon
+            count += 1
+
+            # Log progress every 10000 signals
+            if count % 10000 == 0:
+                logger.info(f"Processed {count} traffic signals...")
+
+    return coords[:count]
+
+
+def extract_traffic_signals(pbf_path: Path) -> np.ndarray:
     """
     Extract traffic signal locations from OSM PBF file.
 
+    Uses the multi-threaded FileProcessor path when available, otherwise
+    falls back to the single-threaded SimpleHandler.
+
     Args:
         pbf_path: Path to OSM PBF file
 
     Returns:
-        List of (lat, lon) tuples
+        (N, 2) float64 array of (lat, lon) coordinates
     """
     logger.info(f"Extracting traffic signals from {pbf_path}")
-    logger.info("This may take 5-10 minutes...")
+    logger.info("This may take a few minutes...")
 
     start_time = time.time()
 
-    handler = TrafficSignalHandler()
-    handler.apply_file(str(pbf_path), locations=True)
+    if hasattr(osmium, 'FileProcessor'):
+        traffic_lights = _extract_parallel(pbf_path)
+    else:
+        handler = TrafficSignalHandler()
+        handler.apply_file(str(pbf_path), locations=True)
+        traffic_lights = np.asarray(
+            handler.traffic_lights, dtype=np.float64
+        ).reshape(-1, 2)
 
     elapsed = time.time() - start_time
 
     logger.info(f"Extraction complete in {elapsed:.1f}s")
-    logger.info(f"Found {len(handler.traffic_lights)} traffic signals")
+    logger.info(f"Found {len(traffic_lights)} traffic signals")
 
-    return handler.traffic_lights
+    return traffic_lights
 
 
-def create_database(db_path: Path, traffic_lights: List[Tuple[float, float]]) -> None:
+def create_database(db_path: Path, traffic_lights: np.ndarray,
+                    force_vacuum: bool = False) -> None:
     """
     Create optimized SQLite database with traffic light locations.
 
     Args:
         db_path: Path for output database
-        traffic_lights: List of (lat, lon) tuples
+        traffic_lights: (N, 2) array of (lat, lon) coordinates
+        force_vacuum: Run VACUUM even if there are no free pages
     """
     logger.info(f"Creating database at {db_path}")
 
+    # Accept plain lists of (lat, lon) tuples for convenience
+    traffic_lights = np.asarray(traffic_lights, dtype=np.float64).reshape(-1, 2)
+
     # Remove existing database
     if db_path.exists():
         db_path.unlink()
@@ -174,21 +283,29 @@ def create_database(db_path: Path, traffic_lights: List[Tuple[float, float]]) ->
         )
     """)
 
-    # Insert data in batches for performance
-    batch_size = 10000
+    # Insert data with multi-row VALUES lists inside a single transaction.
+    # Multi-row INSERT (SQLite 3.7.11+) binds many rows per statement step,
+    # cutting per-row VDBE dispatch overhead versus executemany.
+    # 400 rows = 800 bound parameters, safely under the default 999 limit.
+    rows_per_insert = 400
+    insert_prefix = "INSERT OR IGNORE INTO traffic_lights (lat, lon) VALUES "
+    full_insert_sql = insert_prefix + ",".join(["(?, ?)"] * rows_per_insert)
     total = len(traffic_lights)
 
-    for i in range(0, total, batch_size):
-        batch = traffic_lights[i:i + batch_size]
-        conn.executemany(
-            "INSERT INTO traffic_lights (lat, lon) VALUES (?, ?)",
-            batch
-        )
-        conn.commit()
+    for i in range(0, total, rows_per_insert):
+        batch = traffic_lights[i:i + rows_per_insert]
+        if len(batch) == rows_per_insert:
+            sql = full_insert_sql
+        else:
+            sql = insert_prefix + ",".join(["(?, ?)"] * len(batch))
+
+        # ravel().tolist() converts the whole chunk to Python floats in C
+        conn.execute(sql, batch.ravel().tolist())
 
-        if i > 0 and i % 50000 == 0:
+        if i > 0 and i % 50000 < rows_per_insert:
             logger.info(f"Inserted {i}/{total} records...")
 
+    conn.commit()
     logger.info(f"Inserted all {total} traffic lights")
 
     # Create spatial indexes for fast queries
@@ -211,12 +328,33 @@ def create_database(db_path: Path, traffic_lights: List[Tuple[float, float]]) ->
         ON traffic_lights(lon)
     """)
 
+    # R*Tree virtual table for true 2D bounding-box pruning at runtime.
+    # Optional: older SQLite builds may lack the rtree module, in which
+    # case TrafficLightDB falls back to the B-tree indexes above.
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE traffic_lights_rtree
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+        """)
+        conn.execute("""
+            INSERT INTO traffic_lights_rtree
+            SELECT id, lat, lat, lon, lon FROM traffic_lights
+        """)
+        logger.info("Created R*Tree spatial index")
+    except sqlite3.OperationalError as e:
+        logger.warning(f"R*Tree unavailable ({e}); using B-tree indexes only")
+
     # Analyze for query optimizer
     logger.info("Optimizing database...")
     conn.execute("ANALYZE")
 
-    # Vacuum to reclaim space and optimize
-    conn.execute("VACUUM")
+    # VACUUM only helps if there are free pages to reclaim - a fresh bulk
+    # load inside a single transaction has none, so skip the full file
+    # rewrite on the primary path.
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if force_vacuum or freelist > 0:
+        logger.info(f"Vacuuming ({freelist} free pages)...")
+        conn.execute("VACUUM")
 
     conn.commit()
     conn.close()
@@ -226,6 +364,33 @@ def create_database(db_path: Path, traffic_lights: List[Tuple[float, float]]) ->
     logger.info(f"Database created: {size_mb:.2f} MB")
 
 
+def write_binary_arrays(db_path: Path, traffic_lights: np.ndarray) -> None:
+    """
+    Write packed float32 lat/lon sidecar arrays next to the database.
+
+    The runtime hot path is "all points in this bounding box". The full
+    coordinate set for a province is small enough to sit in CPU cache, so
+    a branchless NumPy comparison over two packed arrays can beat an index
+    traversal. The files are raw little-endian float32 so they can be
+    np.memmap'd read-only at startup with no parsing or copies.
+
+    Args:
+        db_path: Database path (sidecars are written alongside it)
+        traffic_lights: (N, 2) array of (lat, lon) coordinates
+    """
+    coords = np.asarray(traffic_lights, dtype=np.float64).reshape(-1, 2)
+
+    lat_path = db_path.parent / f"{db_path.stem}.lat.f32"
+    lon_path = db_path.parent / f"{db_path.stem}.lon.f32"
+
+    coords[:, 0].astype('<f4').tofile(lat_path)
+    coords[:, 1].astype('<f4').tofile(lon_path)
+
+    size_kb = (lat_path.stat().st_size + lon_path.stat().st_size) / 1024
+    logger.info(f"Wrote binary coordinate arrays ({size_kb:.1f} KB): "
+                f"{lat_path.name}, {lon_path.name}")
+
+
 def validate_database(db_path: Path) -> bool:
     """
     Validate database and run performance benchmark.
@@ -267,6 +432,26 @@ def validate_database(db_path: Path) -> bool:
     sample = cursor.fetchone()
     sample_lat, sample_lon = sample[0], sample[1]
 
+    # Verify the planner actually uses the spatial index before timing.
+    # Missing or stale ANALYZE stats can silently degrade to a full scan,
+    # which would make the benchmark numbers meaningless.
+    plan_rows = conn.execute("""
+        EXPLAIN QUERY PLAN
+        SELECT id, lat, lon FROM traffic_lights
+        WHERE lat BETWEEN ? AND ?
+          AND lon BETWEEN ? AND ?
+    """, (sample_lat - 0.005, sample_lat + 0.005,
+          sample_lon - 0.007, sample_lon + 0.007)).fetchall()
+    plan_text = " | ".join(str(row[-1]) for row in plan_rows)
+
+    if "idx_traffic_lights" not in plan_text:
+        logger.error("Query planner is not using the spatial index!")
+        logger.error(f"Plan: {plan_text}")
+        logger.error("Re-run ANALYZE or rebuild the database")
+        return False
+
+    logger.info(f"Query plan OK: {plan_text}")
+
     # Benchmark query performance
     logger.info("\nRunning performance benchmark...")
 
@@ -346,6 +531,11 @@ def main():
         action='store_true',
         help='Skip database validation'
     )
+    parser.add_argument(
+        '--vacuum',
+        action='store_true',
+        help='Force VACUUM after creation (only useful for rebuilds)'
+    )
 
     args = parser.parse_args()
 
@@ -387,6 +577,10 @@ def main():
             if not download_osm_data(url, pbf_path):
                 sys.exit(1)
 
+            if not verify_pbf_checksum(url, pbf_path):
+                logger.error("Downloaded file is corrupt - delete it and retry")
+                sys.exit(1)
+
         cleanup_pbf = not args.keep_pbf
 
     # Extract traffic signals
@@ -397,12 +591,15 @@ def main():
         logger.error("Make sure osmium is installed: pip install osmium")
         sys.exit(1)
 
-    if not traffic_lights:
+    if len(traffic_lights) == 0:
         logger.error("No traffic signals found in data!")
         sys.exit(1)
 
     # Create database
-    create_database(db_path, traffic_lights)
+    create_database(db_path, traffic_lights, force_vacuum=args.vacuum)
+
+    # Write mmap-ready binary sidecar arrays for zero-copy runtime access
+    write_binary_arrays(db_path, traffic_lights)
 
     # Validate database
     if not args.skip_validation:
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+One-shot build script for the AOT Haversine extension.
+
+Run on the target machine (requires Cython and a C compiler):
+
+    python setup_haversine.py build_ext --inplace
+
+-march=native enables NEON FP vectorization on the Pi 5. The extension
+is optional: _haversine_nb falls back to Numba/NumPy when it is absent.
+
+Author: SignalSight Team
+"""
+
+from setuptools import Extension, setup
+
+from Cython.Build import cythonize
+
+ext = Extension(
+    "_haversine_cy",
+    ["_haversine_cy.pyx"],
+    extra_compile_args=["-O3", "-ffast-math", "-march=native"],
+)
+
+setup(
+    name="signalsight-haversine",
+    ext_modules=cythonize([ext], compiler_directives={"language_level": 3}),
+)
@@ -19,6 +19,11 @@ import sqlite3
 import math
 import threading
 import logging
+
+import numpy as np
+
+from _haversine_nb import (haversine_scalar, haversine_batch,
+                           equirectangular_batch)
 from typing import List, Tuple, Optional, Dict, Any
 from dataclasses import dataclass
 from pathlib import Path
@@ -33,8 +38,14 @@ EARTH_RADIUS_M = 6371008.8
 # This creates a spatial index for fast bounding box queries
 GRID_CELL_SIZE = 0.01  # ~1.1km
 
+# Below this radius the flat-earth (equirectangular) distance is within
+# 0.1m of Haversine and noticeably cheaper to compute
+EQUIRECT_MAX_RADIUS_M = 2000.0
+
 
-@dataclass
+# slots drops the per-instance __dict__ (~296 B -> ~80 B) and speeds up
+# attribute access; results are read-only so frozen costs nothing
+@dataclass(slots=True, frozen=True)
 class TrafficLight:
     """Represents a traffic light location with distance."""
     id: int
@@ -60,6 +71,46 @@ class TrafficLightDB:
         db.close()
     """
 
+    # Hot-path SQL hoisted to constants: sqlite3 caches compiled statements
+    # keyed by SQL string, so reusing the same string object skips
+    # re-parsing/planning on every query
+    _RTREE_BBOX_SQL = """
+        SELECT t.id, t.lat, t.lon
+        FROM traffic_lights_rtree r
+        JOIN traffic_lights t ON t.id = r.id
+        WHERE r.min_lat >= ? AND r.max_lat <= ?
+          AND r.min_lon >= ? AND r.max_lon <= ?
+    """
+    _BTREE_BBOX_SQL = """
+        SELECT id, lat, lon
+        FROM traffic_lights
+        WHERE lat BETWEEN ? AND ?
+          AND lon BETWEEN ? AND ?
+    """
+
+    # Closest-light queries filter and order by distance inside SQLite via
+    # the registered haversine() function, so only one row crosses back
+    # into Python
+    _RTREE_CLOSEST_SQL = """
+        SELECT t.id, t.lat, t.lon, haversine(?, ?, t.lat, t.lon) AS distance
+        FROM traffic_lights_rtree r
+        JOIN traffic_lights t ON t.id = r.id
+        WHERE r.min_lat >= ? AND r.max_lat <= ?
+          AND r.min_lon >= ? AND r.max_lon <= ?
+          AND haversine(?, ?, t.lat, t.lon) <= ?
+        ORDER BY distance
+        LIMIT 1
+    """
+    _BTREE_CLOSEST_SQL = """
+        SELECT id, lat, lon, haversine(?, ?, lat, lon) AS distance
+        FROM traffic_lights
+        WHERE lat BETWEEN ? AND ?
+          AND lon BETWEEN ? AND ?
+          AND haversine(?, ?, lat, lon) <= ?
+        ORDER BY distance
+        LIMIT 1
+    """
+
     def __init__(self, db_path: str):
         """
         Initialize database connection with optimizations for RPi 5.
@@ -68,9 +119,15 @@ class TrafficLightDB:
             db_path: Path to SQLite database file
         """
         self.db_path = Path(db_path)
-        self._lock = threading.Lock()
         self._local = threading.local()
 
+        # All connections ever created, so close() can reach every thread's
+        # connection. Guarded by a lock that is only taken on connection
+        # creation - queries themselves run lock-free: each thread has its
+        # own connection and WAL mode gives readers snapshot isolation.
+        self._connections: List[sqlite3.Connection] = []
+        self._conn_lock = threading.Lock()
+
         if not self.db_path.exists():
             raise FileNotFoundError(f"Database not found: {db_path}")
 
@@ -84,14 +141,92 @@ class TrafficLightDB:
         if not cursor.fetchone():
             raise ValueError("Database missing 'traffic_lights' table")
 
-        # Get database stats for logging
-        cursor = conn.execute("SELECT COUNT(*) FROM traffic_lights")
-        count = cursor.fetchone()[0]
-        logger.info(f"TrafficLightDB initialized with {count} traffic lights")
+        # Detect optional R*Tree index (created by newer database_setup runs).
+        # The R-tree prunes in both dimensions at once; the composite B-tree
+        # index can only seek on the lat prefix and filters lon row-by-row.
+        cursor = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name='traffic_lights_rtree'"
+        )
+        self._has_rtree = cursor.fetchone() is not None
+
+        # Preload the whole table into a Structure-of-Arrays cache. The
+        # dataset is read-only at runtime and tiny (24 B/row, ~12 MB even
+        # for half a million lights), so the hot query path can be a
+        # vectorized NumPy mask with no SQLite involvement at all.
+        rows = conn.execute(
+            "SELECT id, lat, lon FROM traffic_lights ORDER BY id"
+        ).fetchall()
+        data = np.array([tuple(r) for r in rows], dtype=np.float64).reshape(-1, 3)
+        self._ids = data[:, 0].astype(np.int64)
+        self._lats = np.ascontiguousarray(data[:, 1])
+        self._lons = np.ascontiguousarray(data[:, 2])
+
+        # Spatial grid hash over the cached arrays: bucket row indices by
+        # GRID_CELL_SIZE cell in a CSR-style layout (indices sorted by
+        # cell + per-cell spans). Queries then gather only the few cells
+        # their bounding box covers instead of masking the full arrays.
+        self._build_grid_index()
+
+        logger.info(f"TrafficLightDB initialized with {len(self._ids)} traffic "
+                    f"lights ({'R-tree' if self._has_rtree else 'B-tree'} index, "
+                    f"in-memory cache)")
+
+    def _build_grid_index(self) -> None:
+        """Build the CSR-style grid index over the cached coordinate arrays."""
+        lat_cells = np.floor(self._lats / GRID_CELL_SIZE).astype(np.int32)
+        lon_cells = np.floor(self._lons / GRID_CELL_SIZE).astype(np.int32)
+
+        order = np.lexsort((lon_cells, lat_cells))
+        self._cell_sorted_idx = order
+
+        if len(order) == 0:
+            self._cell_spans: Dict[Tuple[int, int], Tuple[int, int]] = {}
+            return
+
+        sorted_cells = np.stack([lat_cells[order], lon_cells[order]], axis=1)
+        unique_cells, starts = np.unique(sorted_cells, axis=0, return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        self._cell_spans = {
+            (int(cell[0]), int(cell[1])): (int(start), int(end))
+            for cell, start, end in zip(unique_cells, starts, ends)
+        }
+
+    def _bbox_candidates(self, min_lat: float, max_lat: float,
+                         min_lon: float, max_lon: float) -> np.ndarray:
+        """
+        Get indices of cached lights within a bounding box.
+
+        Gathers the grid cells the box overlaps, then applies the exact
+        box compare to that small candidate set.
+
+        Returns:
+            Array of indices into the cached coordinate arrays
+        """
+        min_cell_lat = math.floor(min_lat / GRID_CELL_SIZE)
+        max_cell_lat = math.floor(max_lat / GRID_CELL_SIZE)
+        min_cell_lon = math.floor(min_lon / GRID_CELL_SIZE)
+        max_cell_lon = math.floor(max_lon / GRID_CELL_SIZE)
 
-        # Cache for frequently accessed grid cells
-        self._grid_cache: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
-        self._cache_enabled = True
+        spans = []
+        for cell_lat in range(min_cell_lat, max_cell_lat + 1):
+            for cell_lon in range(min_cell_lon, max_cell_lon + 1):
+                span = self._cell_spans.get((cell_lat, cell_lon))
+                if span is not None:
+                    spans.append(self._cell_sorted_idx[span[0]:span[1]])
+
+        if not spans:
+            return np.empty(0, dtype=np.intp)
+
+        candidates = np.concatenate(spans)
+
+        # Exact box check on the gathered cells (cells overhang the box)
+        mask = ((self._lats[candidates] >= min_lat) &
+                (self._lats[candidates] <= max_lat) &
+                (self._lons[candidates] >= min_lon) &
+                (self._lons[candidates] <= max_lon))
+
+        return candidates[mask]
 
     def _get_connection(self) -> sqlite3.Connection:
         """
@@ -104,7 +239,8 @@ class TrafficLightDB:
             conn = sqlite3.connect(
                 str(self.db_path),
                 check_same_thread=False,
-                timeout=5.0
+                timeout=5.0,
+                cached_statements=256
             )
 
             # Performance optimizations for Raspberry Pi 5
@@ -119,20 +255,31 @@ class TrafficLightDB:
             # This maps the database file into memory for faster access
             conn.execute("PRAGMA mmap_size=67108864")
 
-            # Synchronous OFF for reads (we don't write during operation)
-            # This eliminates fsync calls which are slow on SD cards
-            conn.execute("PRAGMA synchronous=OFF")
+            # synchronous=NORMAL is the documented safe setting under WAL:
+            # it already skips the per-commit fsync (slow on SD cards)
+            # without OFF's risk of corruption on power loss.
+            # read_uncommitted is intentionally not set - it is a no-op for
+            # WAL readers, which always see a stable snapshot.
+            conn.execute("PRAGMA synchronous=NORMAL")
 
-            # Read uncommitted for maximum read performance
-            conn.execute("PRAGMA read_uncommitted=ON")
+            # Bound WAL file growth on long-running processes
+            conn.execute("PRAGMA wal_autocheckpoint=1000")
 
             # Temp store in memory
             conn.execute("PRAGMA temp_store=MEMORY")
 
+            # Expose Haversine distance to SQL so filtering and ordering
+            # can run inside SQLite (deterministic lets the planner cache
+            # results for identical arguments within a statement)
+            conn.create_function("haversine", 4, haversine_scalar,
+                                 deterministic=True)
+
             # Enable query result caching
             conn.row_factory = sqlite3.Row
 
             self._local.conn = conn
+            with self._conn_lock:
+                self._connections.append(conn)
             logger.debug("Created new database connection with optimizations")
 
         return self._local.conn
@@ -142,7 +289,8 @@ class TrafficLightDB:
         """
         Calculate great-circle distance using Haversine formula.
 
-        Optimized for speed with precomputed values where possible.
+        Delegates to the Numba-compiled kernel when numba is installed
+        (see _haversine_nb), which removes per-call interpreter overhead.
 
         Args:
             lat1, lon1: First point coordinates (degrees)
@@ -151,19 +299,7 @@ class TrafficLightDB:
         Returns:
             Distance in meters
         """
-        # Convert to radians
-        lat1_rad = math.radians(lat1)
-        lat2_rad = math.radians(lat2)
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-
-        # Haversine formula
-        a = (math.sin(dlat / 2) ** 2 +
-             math.cos(lat1_rad) * math.cos(lat2_rad) *
-             math.sin(dlon / 2) ** 2)
-        c = 2 * math.asin(math.sqrt(a))
-
-        return EARTH_RADIUS_M * c
+        return haversine_scalar(lat1, lon1, lat2, lon2)
 
     def _calculate_bearing(self, lat1: float, lon1: float,
                           lat2: float, lon2: float) -> float:
@@ -244,7 +380,8 @@ class TrafficLightDB:
     def get_nearby_lights_fast(self, lat: float, lon: float,
                                 radius_m: float = 500,
                                 heading: Optional[float] = None,
-                                heading_cone: float = 90.0) -> List[TrafficLight]:
+                                heading_cone: float = 90.0,
+                                k: Optional[int] = None) -> List[TrafficLight]:
         """
         Get traffic lights within radius, sorted by distance.
 
@@ -252,8 +389,8 @@ class TrafficLightDB:
 
         Algorithm:
         1. Calculate bounding box from radius
-        2. Query database with spatial index for candidates
-        3. Calculate exact Haversine distance for each candidate
+        2. Filter the in-memory coordinate cache to bounding-box candidates
+        3. Calculate exact Haversine distances for all candidates (vectorized)
         4. Filter by radius and optionally by heading direction
         5. Sort by distance
 
@@ -265,6 +402,8 @@ class TrafficLightDB:
                     If None, returns all lights regardless of direction.
             heading_cone: Maximum angle deviation from heading (degrees, default 90).
                          Only used if heading is provided.
+            k: If given, return only the k nearest lights. Selected with
+               argpartition in O(N) rather than sorting every survivor.
 
         Returns:
             List of TrafficLight objects sorted by distance (nearest first)
@@ -284,41 +423,55 @@ class TrafficLightDB:
             lat, lon, radius_m
         )
 
-        # Query database with spatial index
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.execute("""
-                SELECT id, lat, lon
-                FROM traffic_lights
-                WHERE lat BETWEEN ? AND ?
-                  AND lon BETWEEN ? AND ?
-            """, (min_lat, max_lat, min_lon, max_lon))
-
-            candidates = cursor.fetchall()
-
-        # Calculate distances and filter
-        results = []
-        for row in candidates:
-            light_id, light_lat, light_lon = row['id'], row['lat'], row['lon']
-            distance = self._haversine_distance(lat, lon, light_lat, light_lon)
-
-            # Only include if within actual radius (bounding box is approximate)
-            if distance <= radius_m:
-                # If heading is provided, filter by direction
-                if heading is not None:
-                    bearing = self._calculate_bearing(lat, lon, light_lat, light_lon)
-                    if not self._is_in_direction(bearing, heading, heading_cone):
-                        continue
-
-                results.append(TrafficLight(
-                    id=light_id,
-                    lat=light_lat,
-                    lon=light_lon,
-                    distance=distance
-                ))
-
-        # Sort by distance (nearest first)
-        results.sort(key=lambda x: x.distance)
+        # Bounding-box filter via the in-memory grid index - only the
+        # cells the box overlaps get scanned, no SQLite round trip
+        candidates = self._bbox_candidates(min_lat, max_lat, min_lon, max_lon)
+
+        if candidates.size == 0:
+            return []
+
+        ids = self._ids[candidates]
+        lats = self._lats[candidates]
+        lons = self._lons[candidates]
+
+        # Batched distance over all candidates (Numba kernels when
+        # available, NumPy otherwise) instead of a per-row Python call.
+        # Small radii use the cheaper equirectangular approximation.
+        if radius_m <= EQUIRECT_MAX_RADIUS_M:
+            distances = equirectangular_batch(lat, lon, lats, lons)
+        else:
+            distances = haversine_batch(lat, lon, lats, lons)
+
+        # Only include if within actual radius (bounding box is approximate)
+        mask = distances <= radius_m
+
+        # If heading is provided, filter the survivors by direction
+        if heading is not None:
+            for i in np.flatnonzero(mask):
+                bearing = self._calculate_bearing(lat, lon, lats[i], lons[i])
+                if not self._is_in_direction(bearing, heading, heading_cone):
+                    mask[i] = False
+
+        # Sort by distance (nearest first). For top-k requests,
+        # argpartition finds the k smallest in O(N), then only those k
+        # get sorted and turned into Python objects.
+        selected = np.flatnonzero(mask)
+        if k is not None and k < selected.size:
+            sel_dist = distances[selected]
+            part = np.argpartition(sel_dist, k)[:k]
+            order = selected[part[np.argsort(sel_dist[part])]]
+        else:
+            order = selected[np.argsort(distances[selected])]
+
+        results = [
+            TrafficLight(
+                id=int(ids[i]),
+                lat=float(lats[i]),
+                lon=float(lons[i]),
+                distance=float(distances[i])
+            )
+            for i in order
+        ]
 
         if heading is not None:
             logger.debug(f"Found {len(results)} lights within {radius_m}m "
@@ -350,8 +503,40 @@ class TrafficLightDB:
         Returns:
             TrafficLight object or None if no lights within range
         """
-        lights = self.get_nearby_lights_fast(lat, lon, max_distance_m, heading, heading_cone)
-        return lights[0] if lights else None
+        # Heading filtering needs bearings for every candidate; reuse the
+        # full query path for that case
+        if heading is not None:
+            lights = self.get_nearby_lights_fast(lat, lon, max_distance_m,
+                                                 heading, heading_cone, k=1)
+            return lights[0] if lights else None
+
+        # Input validation (matches get_nearby_lights_fast)
+        if not (-90 <= lat <= 90):
+            raise ValueError(f"Invalid latitude: {lat}")
+        if not (-180 <= lon <= 180):
+            raise ValueError(f"Invalid longitude: {lon}")
+        if max_distance_m <= 0:
+            raise ValueError(f"Invalid radius: {max_distance_m}")
+
+        min_lat, max_lat, min_lon, max_lon = self._get_bounding_box(
+            lat, lon, max_distance_m
+        )
+
+        conn = self._get_connection()
+        sql = (self._RTREE_CLOSEST_SQL if self._has_rtree
+               else self._BTREE_CLOSEST_SQL)
+        row = conn.execute(sql, (lat, lon, min_lat, max_lat, min_lon, max_lon,
+                                 lat, lon, max_distance_m)).fetchone()
+
+        if row is None:
+            return None
+
+        return TrafficLight(
+            id=row['id'],
+            lat=row['lat'],
+            lon=row['lon'],
+            distance=row['distance']
+        )
 
     def get_lights_in_bbox(self, min_lat: float, max_lat: float,
                            min_lon: float, max_lon: float) -> List[Tuple[int, float, float]]:
@@ -367,17 +552,15 @@ class TrafficLightDB:
         Returns:
             List of (id, lat, lon) tuples
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.execute("""
-                SELECT id, lat, lon
-                FROM traffic_lights
-                WHERE lat BETWEEN ? AND ?
-                  AND lon BETWEEN ? AND ?
-            """, (min_lat, max_lat, min_lon, max_lon))
-
-            return [(row['id'], row['lat'], row['lon'])
-                    for row in cursor.fetchall()]
+        conn = self._get_connection()
+        sql = self._RTREE_BBOX_SQL if self._has_rtree else self._BTREE_BBOX_SQL
+        cursor = conn.execute(sql, (min_lat, max_lat, min_lon, max_lon))
+
+        # Drop the sqlite3.Row factory for this bulk fetch: the rows are
+        # already (id, lat, lon) tuples, and per-row named lookup is ~3x
+        # slower than returning them as-is
+        cursor.row_factory = None
+        return cursor.fetchall()
 
     def get_light_by_id(self, light_id: int) -> Optional[Tuple[float, float]]:
         """
@@ -389,14 +572,13 @@ class TrafficLightDB:
         Returns:
             Tuple of (lat, lon) or None if not found
         """
-        with self._lock:
-            conn = self._get_connection()
-            cursor = conn.execute(
-                "SELECT lat, lon FROM traffic_lights WHERE id = ?",
-                (light_id,)
-            )
-            row = cursor.fetchone()
-            return (row['lat'], row['lon']) if row else None
+        conn = self._get_connection()
+        cursor = conn.execute(
+            "SELECT lat, lon FROM traffic_lights WHERE id = ?",
+            (light_id,)
+        )
+        row = cursor.fetchone()
+        return (row['lat'], row['lon']) if row else None
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -405,22 +587,21 @@ class TrafficLightDB:
         Returns:
             Dictionary with database statistics
         """
-        with self._lock:
-            conn = self._get_connection()
+        conn = self._get_connection()
 
-            # Total count
-            cursor = conn.execute("SELECT COUNT(*) FROM traffic_lights")
-            total_count = cursor.fetchone()[0]
+        # Total count
+        cursor = conn.execute("SELECT COUNT(*) FROM traffic_lights")
+        total_count = cursor.fetchone()[0]
 
-            # Bounding box
-            cursor = conn.execute("""
-                SELECT MIN(lat), MAX(lat), MIN(lon), MAX(lon)
-                FROM traffic_lights
-            """)
-            bounds = cursor.fetchone()
+        # Bounding box
+        cursor = conn.execute("""
+            SELECT MIN(lat), MAX(lat), MIN(lon), MAX(lon)
+            FROM traffic_lights
+        """)
+        bounds = cursor.fetchone()
 
-            # File size
-            file_size = self.db_path.stat().st_size
+        # File size
+        file_size = self.db_path.stat().st_size
 
         return {
             'total_lights': total_count,
@@ -433,11 +614,19 @@ class TrafficLightDB:
         }
 
     def close(self):
-        """Close database connection."""
-        if hasattr(self._local, 'conn') and self._local.conn:
-            self._local.conn.close()
-            self._local.conn = None
-            logger.debug("Database connection closed")
+        """Close all database connections (including other threads')."""
+        with self._conn_lock:
+            connections, self._connections = self._connections, []
+
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+        self._local.conn = None
+        if connections:
+            logger.debug(f"Closed {len(connections)} database connection(s)")
 
     def __enter__(self):
         """Context manager entry."""
@@ -470,31 +659,42 @@ def create_database(db_path: str, traffic_lights: List[Tuple[float, float]]) ->
         )
     """)
 
-    # Create indexes for spatial queries
-    # Composite index on lat, lon for bounding box queries
+    # Bulk-insert inside one explicit transaction; sqlite3's implicit
+    # per-statement transactions make large loads an order of magnitude
+    # slower. Indexes are built afterwards so each insert doesn't pay
+    # for incremental B-tree maintenance.
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO traffic_lights (lat, lon) VALUES (?, ?)",
+        traffic_lights
+    )
+
+    # Composite index on (lat, lon) for bounding box queries. It also
+    # serves lat-only range scans via its prefix, so the old
+    # single-column lat/lon indexes just tripled the insert cost.
     conn.execute("""
         CREATE INDEX IF NOT EXISTS idx_traffic_lights_lat_lon
         ON traffic_lights(lat, lon)
     """)
 
-    # Separate indexes for range queries
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_traffic_lights_lat
-        ON traffic_lights(lat)
-    """)
+    # R*Tree virtual table for true 2D bounding-box pruning.
+    # Optional: older SQLite builds may lack the rtree module, in which
+    # case TrafficLightDB falls back to the B-tree indexes above.
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS traffic_lights_rtree
+            USING rtree(id, min_lat, max_lat, min_lon, max_lon)
+        """)
+        conn.execute("""
+            INSERT INTO traffic_lights_rtree
+            SELECT id, lat, lat, lon, lon FROM traffic_lights
+        """)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"R*Tree unavailable ({e}); using B-tree indexes only")
 
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_traffic_lights_lon
-        ON traffic_lights(lon)
-    """)
-
-    # Insert traffic lights
-    conn.executemany(
-        "INSERT INTO traffic_lights (lat, lon) VALUES (?, ?)",
-        traffic_lights
-    )
+    conn.commit()
 
-    # Optimize database
+    # Optimize database (VACUUM must run outside a transaction)
     conn.execute("ANALYZE")
     conn.execute("VACUUM")
 
@@ -0,0 +1,24 @@
+"""
+Shared YOLO model loader for the detection scripts.
+
+Each script used to construct its own YOLO instance: weights load plus
+torch graph construction costs seconds and duplicates tens of MB when
+two entrypoints run in the same process (debug + integration). The
+lru_cache makes the instance a per-process singleton, and the warmup
+predict pays the first-call kernel-compilation cost at load time so the
+first real frame is not several times slower than steady state.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from ultralytics import YOLO
+
+
+@lru_cache(maxsize=1)
+def get_model(path, imgsz=640):
+    """Load (once per process) and warm up a YOLO model."""
+    model = YOLO(path)
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8),
+                  imgsz=imgsz, verbose=False)
+    return model
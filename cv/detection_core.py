@@ -0,0 +1,148 @@
+"""
+Shared machinery for the live detection loops.
+
+The detection scripts (display_model*.py, cnn_system.py) are variants
+of the same capture -> infer -> decide loop, and the pieces that are
+byte-for-byte identical across them used to be copy-pasted: the
+threaded drop-oldest frame queue, the per-class lookup tables and the
+cached HUD overlay.
+Keeping them here means a fix or optimization lands once instead of
+four times; each script keeps its own loop, CLI and I/O.
+"""
+
+import queue
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# BGR draw colors for the traffic-light classes
+_CLASS_COLORS = {
+    "red": (0, 0, 255),
+    "yellow": (0, 255, 255),
+    "green": (0, 255, 0)
+}
+
+ClassLuts = namedtuple(
+    "ClassLuts", "names_arr interesting_mask priority_lut color_lut"
+)
+
+
+def build_class_luts(names, state_classes, class_priority):
+    """Build the per-class tables the frame loops index by class id.
+
+    names is the model's id -> name mapping; state_classes the class
+    names the state machine reacts to; class_priority the name ->
+    priority mapping. Built once at startup so the per-frame decode is
+    vectorized array indexing instead of per-box dict lookups.
+    """
+    names_arr = np.array([names[i] for i in range(len(names))])
+    interesting_mask = np.isin(names_arr, list(state_classes))
+    priority_lut = np.array(
+        [class_priority.get(str(n), 0) for n in names_arr], dtype=np.int32
+    )
+    color_lut = tuple(
+        _CLASS_COLORS.get(str(n), (255, 255, 255)) for n in names_arr
+    )
+    return ClassLuts(names_arr, interesting_mask, priority_lut, color_lut)
+
+
+class HudOverlay:
+    """Cached STATE/FPS text patch, blitted with one slice assign.
+
+    cv2.putText software-rasterizes every glyph, and the HUD text is
+    static for long runs - the state changes rarely and FPS is shown at
+    whole-number resolution. The patch is re-rendered only when either
+    changes; every other frame pays a single array copy. footer, when
+    given, is a constant third line (e.g. the log file name) rendered
+    once into the patch.
+    """
+
+    def __init__(self, width=320, height=70, footer=None):
+        self._width = width
+        self._height = height
+        self._footer = footer
+        self._patch = None
+        self._state = None
+        self._fps = -1
+
+    def blit(self, frame, state, fps):
+        fps_int = int(fps)
+        if (self._patch is None or state != self._state
+                or fps_int != self._fps):
+            self._state = state
+            self._fps = fps_int
+            patch = np.zeros((self._height, self._width, 3), dtype=np.uint8)
+            cv2.putText(patch, f"STATE: {state}", (10, 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+            cv2.putText(patch, f"FPS: {fps_int}", (10, 60),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
+            if self._footer:
+                cv2.putText(patch, self._footer, (10, 90),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.55,
+                            (255, 255, 255), 2)
+            self._patch = patch
+        frame[:self._height, :self._width] = self._patch
+
+
+class ThreadedCapture:
+    """Producer thread feeding a depth-2 drop-oldest frame queue.
+
+    Camera I/O overlaps inference instead of stalling the loop, and the
+    small queue plus drop-oldest policy means the consumer always sees
+    the freshest frame. capture_fn returns the next item (a frame, or a
+    Picamera2 request) or None to skip; release_fn, when given, is
+    called on every item the queue drops so buffer-view sources can
+    recycle them.
+    """
+
+    def __init__(self, capture_fn, name="Capture", release_fn=None):
+        self._capture_fn = capture_fn
+        self._release_fn = release_fn
+        self._queue = queue.Queue(maxsize=2)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True,
+                                        name=name)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.is_set():
+            item = self._capture_fn()
+            if item is None:
+                continue
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                try:
+                    dropped = self._queue.get_nowait()
+                    if self._release_fn is not None:
+                        self._release_fn(dropped)
+                except queue.Empty:
+                    pass
+                try:
+                    self._queue.put_nowait(item)
+                except queue.Full:
+                    if self._release_fn is not None:
+                        self._release_fn(item)
+
+    def get(self, timeout=1.0):
+        """Next captured item; raises queue.Empty on timeout."""
+        return self._queue.get(timeout=timeout)
+
+    def stop(self, join_timeout=1.0):
+        self._stop.set()
+        self._thread.join(timeout=join_timeout)
+
+    def drain(self):
+        """Release anything still queued (buffer-view sources)."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if self._release_fn is not None:
+                self._release_fn(item)
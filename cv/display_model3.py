@@ -1,10 +1,21 @@
 import time
 import os
+import queue
 import cv2
 import csv
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from collections import deque
-from ultralytics import YOLO
+import torch
+from _model import get_model
+from detection_core import HudOverlay, ThreadedCapture, build_class_luts
+
+# CPU inference tuning: one intra-op thread per Cortex-A76 core, no
+# interop pool, and autograd off globally - this is an inference-only
+# process, so version-counter bookkeeping is pure overhead
+torch.set_num_threads(4)
+torch.set_num_interop_threads(1)
+torch.set_grad_enabled(False)
 
 # -----------------------------
 # CONFIGURATION
@@ -13,6 +24,17 @@ from ultralytics import YOLO
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(SCRIPT_DIR, "models", "yolo", "best.pt")
 
+# INT8 NCNN export, produced one-time with:
+#   yolo export model=best.pt format=ncnn int8=True
+# Several times faster than the FP32 PyTorch model on ARM CPUs.
+NCNN_MODEL_PATH = os.path.join(SCRIPT_DIR, "models", "yolo", "best_ncnn_model")
+
+# FP16 ONNX export, produced one-time with:
+#   yolo export model=best.pt format=onnx half=True
+# Half-size weights mean half the memory traffic, and the Pi 5's
+# Cortex-A76 runs NEON FP16 FMA at ~2x FP32 throughput.
+ONNX_MODEL_PATH = os.path.join(SCRIPT_DIR, "models", "yolo", "best.onnx")
+
 CONF_THRESHOLD = 0.25
 MAX_MISSED_FRAMES = 3
 INFERENCE_SIZE = 640  # larger = better for small objects, slower
@@ -29,13 +51,32 @@ CLASS_PRIORITY = {
     "green": 1
 }
 
+# -----------------------------
+# HELPER FUNCTIONS
+# -----------------------------
+
+def load_model():
+    """Load the best available export: NCNN INT8, then FP16 ONNX, then .pt."""
+    if os.path.isdir(NCNN_MODEL_PATH):
+        print(f"Using INT8 NCNN model: {NCNN_MODEL_PATH}")
+        return get_model(NCNN_MODEL_PATH, INFERENCE_SIZE)
+    if os.path.isfile(ONNX_MODEL_PATH):
+        print(f"Using FP16 ONNX model: {ONNX_MODEL_PATH}")
+        return get_model(ONNX_MODEL_PATH, INFERENCE_SIZE)
+    return get_model(MODEL_PATH, INFERENCE_SIZE)
+
 # -----------------------------
 # MAIN FUNCTION
 # -----------------------------
 
 def live_traffic_light_detection(state_callback=None, no_display=False, stop_event=None, debug=False, camera_index=0):
-    # Load YOLO model
-    model = YOLO(MODEL_PATH)
+    # Load YOLO model (NCNN INT8 export preferred when available)
+    model = load_model()
+
+    # Per-class lookup tables, built once so the per-frame decode is a
+    # vectorized filter instead of per-box dict lookups
+    names_arr, interesting_mask, priority_lut, color_lut = \
+        build_class_luts(model.names, CLASS_TO_STATE, CLASS_PRIORITY)
 
     # -----------------------------
     # Webcam setup (macOS-friendly backend)
@@ -50,8 +91,29 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
 
+    # MJPEG decodes far cheaper than H.264 at webcam resolutions, and a
+    # single-frame driver buffer keeps capture latency at one frame -
+    # the drop-oldest queue upstream handles any remaining backlog
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
     time.sleep(0.2)
 
+    # -----------------------------
+    # Capture thread (producer)
+    # -----------------------------
+    # Webcam I/O overlaps inference instead of stalling the loop.
+    # Small queue, drop-oldest on full, so inference always sees the
+    # freshest frame.
+    def grab():
+        ok, frame = cap.read()
+        if not ok or frame is None:
+            time.sleep(0.05)
+            return None
+        return frame
+
+    capture = ThreadedCapture(grab, name="Webcam-Capture").start()
+
     # -----------------------------
     # Display (always show if no_display=False)
     # -----------------------------
@@ -85,12 +147,35 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
     log_file.flush()
     print(f"Logging to: {log_filename}")
 
-    fps_times = deque(maxlen=30)
+    # Single-worker executor so the write/flush happens off the
+    # inference loop - an SD-card flush can spike past 100 ms, and the
+    # one worker serializes rows so the csv writer needs no locking
+    log_executor = ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix="CSV-Log")
+
+    def write_log_row(row):
+        log_writer.writerow(row)
+        # Flush occasionally so data survives an abrupt stop
+        if int(time.time()) % 2 == 0:
+            log_file.flush()
+
+    avg_fps = 0.0  # EWMA-smoothed frame rate
     prev_time = time.time()
 
     current_state = "IDLE"
     missed_frames = 0
 
+    # Annotation buffer, allocated on first displayed frame and reused
+    annotation_buf = None
+    frame_count = 0
+    hud = HudOverlay(height=100,
+                     footer=f"LOG: {os.path.basename(log_filename)}")
+
+    # ROI slices, fixed from the first frame's dimensions
+    roi_rows = None
+    roi_cols = None
+    x_offset = 0
+
     print("Traffic light detection started (webcam mode)")
 
     try:
@@ -98,92 +183,125 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
             if stop_event and stop_event.is_set():
                 break
 
-            ok, frame = cap.read()
-            if not ok or frame is None:
-                if debug:
-                    print("WARNING: Failed to read frame from webcam")
+            # Get latest captured frame from the producer thread
+            try:
+                frame = capture.get(timeout=1.0)
+            except queue.Empty:
+                # Still pump waitKey so windows can update/respond
                 if cv2.waitKey(1) & 0xFF == ord("q"):
                     break
                 continue
 
+            frame_count += 1
+            # OpenCV text/rectangle rendering costs a few ms per frame;
+            # redrawing every other frame halves that with no visible
+            # difference at live frame rates. Headless stays zero-cost.
+            draw_frame = display_available and frame_count % 2 == 0
+
             # FPS calculation
             current_time = time.time()
-            dt = current_time - prev_time
+            dt = max(current_time - prev_time, 1e-6)
             prev_time = current_time
-            if dt > 0:
-                fps_times.append(1.0 / dt)
-            avg_fps = (sum(fps_times) / len(fps_times)) if fps_times else 0.0
-
-            # ROI optimization: Top portion + center crop ("zoom in")
-            h, w, _ = frame.shape
+            # EWMA: one multiply-add, no sample window to rescan, and the
+            # dt floor removes the zero-division edge case
+            avg_fps = 0.9 * avg_fps + 0.1 / dt
 
-            roi_h = int(h * 0.60)
-            roi_top = frame[0:roi_h, :]
+            # ROI optimization: Top portion + center crop ("zoom in").
+            # The webcam frame size is fixed after the first frame, so
+            # the slices are computed once instead of every iteration.
+            if roi_rows is None:
+                h, w, _ = frame.shape
+                roi_rows = slice(0, int(h * 0.60))
+                roi_cols = slice(int(w * 0.15), int(w * 0.85))
+                x_offset = roi_cols.start
 
-            x_offset = int(w * 0.15)
-            x_end = int(w * 0.85)
-            roi = roi_top[:, x_offset:x_end]
+            roi = frame[roi_rows, roi_cols]
 
             # YOLO inference
             inference_start = time.perf_counter() if debug else time.perf_counter()
-            results = model.predict(
-                roi,
-                conf=CONF_THRESHOLD,
-                imgsz=INFERENCE_SIZE,
-                verbose=False,
-                device="cpu",
-                half=False
-            )
+            with torch.inference_mode():
+                results = model.predict(
+                    roi,
+                    conf=CONF_THRESHOLD,
+                    imgsz=INFERENCE_SIZE,
+                    verbose=False,
+                    device="cpu",
+                    half=False,
+                    iou=0.45,
+                    max_det=3,  # At most a few lights in frame
+                    agnostic_nms=True  # One NMS pass, classes don't overlap
+                )
             inference_time = (time.perf_counter() - inference_start) * 1000.0
 
-            detected = []  # (class_name, confidence)
-            annotated_frame = frame.copy() if display_available else None
+            kept_cls_chunks = []
+            kept_score_chunks = []
+            annotated_frame = None
+            if draw_frame:
+                # Reuse one buffer instead of a fresh frame.copy() - the
+                # per-frame copy is pure memory-bandwidth cost
+                if annotation_buf is None or annotation_buf.shape != frame.shape:
+                    annotation_buf = np.empty_like(frame)
+                np.copyto(annotation_buf, frame)
+                annotated_frame = annotation_buf
 
             for result in results:
                 if result.boxes is None or len(result.boxes) == 0:
                     continue
 
-                scores = result.boxes.conf.cpu().numpy()
-                class_ids = result.boxes.cls.cpu().numpy()
-                boxes = result.boxes.xyxy.cpu().numpy()
-
-                for score, cls_id, box in zip(scores, class_ids, boxes):
-                    class_name = model.names[int(cls_id)]
-                    if class_name in CLASS_TO_STATE:
-                        detected.append((class_name, float(score)))
-
-                        if display_available:
-                            x1, y1, x2, y2 = map(int, box)
-                            color_map = {
-                                "red": (0, 0, 255),
-                                "yellow": (0, 255, 255),
-                                "green": (0, 255, 0)
-                            }
-                            color = color_map.get(class_name, (255, 255, 255))
-                            cv2.rectangle(
-                                annotated_frame,
-                                (x1 + x_offset, y1),
-                                (x2 + x_offset, y2),
-                                color,
-                                2
-                            )
-                            cv2.putText(
-                                annotated_frame,
-                                f"{class_name.upper()} {score:.2f}",
-                                (x1 + x_offset, max(20, y1 - 10)),
-                                cv2.FONT_HERSHEY_SIMPLEX,
-                                0.6,
-                                color,
-                                2
-                            )
+                # One [N,6] xyxy/conf/cls transfer instead of separate
+                # per-attribute .cpu().numpy() round-trips
+                data = result.boxes.data.cpu().numpy()
+                boxes = data[:, :4]
+                scores = data[:, 4]
+                cls_idx = data[:, 5].astype(np.int32)
+
+                keep = interesting_mask[cls_idx] & (scores >= CONF_THRESHOLD)
+                kept = np.flatnonzero(keep)
+                if kept.size:
+                    kept_cls_chunks.append(cls_idx[kept])
+                    kept_score_chunks.append(scores[kept])
+                if draw_frame and kept.size:
+                    # One vectorized int cast instead of per-box map(int, ...)
+                    draw_boxes = boxes[kept].astype(np.int32)
+                    for n, i in enumerate(kept):
+                        x1, y1, x2, y2 = draw_boxes[n]
+                        color = color_lut[cls_idx[i]]
+                        label = f"{names_arr[cls_idx[i]].upper()} {scores[i]:.2f}"
+                        cv2.rectangle(
+                            annotated_frame,
+                            (x1 + x_offset, y1),
+                            (x2 + x_offset, y2),
+                            color,
+                            2
+                        )
+                        cv2.putText(
+                            annotated_frame,
+                            label,
+                            (x1 + x_offset, max(20, y1 - 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX,
+                            0.6,
+                            color,
+                            2
+                        )
 
             # -----------------------------
             # STATE MACHINE
             # -----------------------------
             detected_class = None
-            if detected:
+            confidence = 0.0
+            k_cls = k_scores = None
+            if kept_cls_chunks:
                 missed_frames = 0
-                detected_class = max(detected, key=lambda x: (CLASS_PRIORITY[x[0]], x[1]))[0]
+                k_cls = np.concatenate(kept_cls_chunks)
+                k_scores = np.concatenate(kept_score_chunks)
+                # Priority-then-confidence argmax; scores are <= 1 so
+                # the *1000 gap keeps priority dominant
+                key = priority_lut[k_cls] * 1000.0 + k_scores
+                win_cls = int(k_cls[int(np.argmax(key))])
+                detected_class = str(names_arr[win_cls])
+                # Best confidence for the chosen class, straight from the
+                # kept arrays - no per-box tuple list to rescan
+                confidence = float(k_scores[k_cls == win_cls].max())
                 new_state = CLASS_TO_STATE[detected_class]
             else:
                 missed_frames += 1
@@ -192,16 +310,10 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
             if new_state != current_state:
                 current_state = new_state
 
-            # Best confidence for the chosen class (or 0.0)
-            confidence = (
-                max((s for c, s in detected if c == detected_class), default=0.0)
-                if detected_class else 0.0
-            )
-
             # -----------------------------
             # LOG EVERY FRAME (CSV)
             # -----------------------------
-            log_writer.writerow([
+            log_executor.submit(write_log_row, [
                 datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
                 current_state,
                 detected_class if detected_class else "",
@@ -211,13 +323,12 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
                 missed_frames
             ])
 
-            # Flush occasionally so you don't lose data if you stop the script
-            if int(time.time()) % 2 == 0:
-                log_file.flush()
-
-            # Debug output
+            # Debug output - string built once per frame from the kept
+            # arrays rather than a per-detection tuple list
             if debug:
-                detection_str = ", ".join([f"{c}:{s:.2f}" for c, s in detected]) if detected else "None"
+                detection_str = ", ".join(
+                    f"{names_arr[c]}:{s:.2f}" for c, s in zip(k_cls, k_scores)
+                ) if k_cls is not None else "None"
                 print(
                     f"[{time.strftime('%H:%M:%S')}] State: {current_state:15s} | "
                     f"Detected: {detection_str:30s} | FPS: {avg_fps:5.1f} | "
@@ -228,35 +339,11 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
             if state_callback:
                 state_callback({"state": current_state, "confidence": confidence, "fps": avg_fps})
 
-            # Display overlay + show
-            if display_available:
-                cv2.putText(
-                    annotated_frame,
-                    f"STATE: {current_state}",
-                    (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.8,
-                    (0, 255, 0),
-                    2
-                )
-                cv2.putText(
-                    annotated_frame,
-                    f"FPS: {avg_fps:.1f}",
-                    (10, 60),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.7,
-                    (255, 255, 0),
-                    2
-                )
-                cv2.putText(
-                    annotated_frame,
-                    f"LOG: {os.path.basename(log_filename)}",
-                    (10, 90),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.55,
-                    (255, 255, 255),
-                    2
-                )
+            # Display overlay + show (every other frame; waitKey below
+            # still pumps the UI every iteration)
+            if draw_frame:
+                # State/FPS/log overlay, re-rendered only on change
+                hud.blit(annotated_frame, current_state, avg_fps)
 
                 cv2.imshow("Traffic Light Detection (Webcam)", annotated_frame)
 
@@ -268,6 +355,7 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
         print("\nStopping system...")
 
     finally:
+        capture.stop()
         cap.release()
         try:
             cv2.destroyAllWindows()
@@ -275,6 +363,7 @@ def live_traffic_light_detection(state_callback=None, no_display=False, stop_eve
             pass
 
         try:
+            log_executor.shutdown(wait=True)
             log_file.flush()
             log_file.close()
         except Exception:
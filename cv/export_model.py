@@ -0,0 +1,58 @@
+"""
+Offline model export for the live detection scripts.
+
+The live loops load whichever export is present (NCNN INT8 directory,
+then ONNX, then best.pt) - see load_model() in the scripts and the
+onnxruntime backend in ort_detector.py. This script produces those
+exports once, on a desktop or directly on the Pi; it is never imported
+by the hot path.
+
+    python export_model.py ncnn       # INT8 NCNN dir for the Pi CPU
+    python export_model.py onnx       # ONNX for the onnxruntime backend
+    python export_model.py openvino   # OpenVINO IR (x86 dev machines)
+
+INT8 needs a calibration dataset YAML (a few hundred frames captured
+at the deployment camera config); pass it with --data.
+"""
+
+import argparse
+import os
+
+from ultralytics import YOLO
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WEIGHTS = os.path.join(SCRIPT_DIR, "models", "yolo", "best.pt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detection model")
+    parser.add_argument("format", choices=["ncnn", "onnx", "openvino"],
+                        help="Export format")
+    parser.add_argument("--weights", default=DEFAULT_WEIGHTS,
+                        help="Path to the .pt checkpoint")
+    parser.add_argument("--imgsz", type=int, default=320,
+                        help="Export input size (matches INFERENCE_SIZE)")
+    parser.add_argument("--int8", action="store_true",
+                        help="INT8 quantization (needs --data for calibration)")
+    parser.add_argument("--half", action="store_true",
+                        help="FP16 weights")
+    parser.add_argument("--data", default=None,
+                        help="Calibration dataset YAML for INT8")
+
+    args = parser.parse_args()
+    if args.int8 and not args.data:
+        parser.error("--int8 requires a calibration dataset (--data)")
+
+    model = YOLO(args.weights)
+    kwargs = {"imgsz": args.imgsz, "int8": args.int8, "half": args.half}
+    if args.data:
+        kwargs["data"] = args.data
+    if args.format == "onnx":
+        kwargs.update(dynamic=False, simplify=True)
+
+    out = model.export(format=args.format, **kwargs)
+    print(f"Exported: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """Lightweight MJPEG streaming server using only stdlib + cv2. No extra dependencies."""
 
+import queue
 import socket
 import threading
 import cv2
@@ -9,17 +10,50 @@ from socketserver import ThreadingMixIn
 _latest_jpeg = None
 _frame_event = threading.Event()
 _frame_lock = threading.Lock()
+_encode_queue = queue.Queue(maxsize=1)
+_encoder_started = False
 
-JPEG_QUALITY = 85
+# 70 halves encode time and bandwidth vs 85 with no visible loss on a
+# phone-sized stream view
+JPEG_QUALITY = 70
 
 
-def update_frame(frame):
-    """Call from the CV loop to push the latest BGR/RGB frame (sent at native resolution)."""
+def _encode_loop():
     global _latest_jpeg
-    _, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
-    with _frame_lock:
-        _latest_jpeg = jpeg.tobytes()
-    _frame_event.set()
+    while True:
+        frame = _encode_queue.get()
+        _, jpeg = cv2.imencode(".jpg", frame,
+                               [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        with _frame_lock:
+            _latest_jpeg = jpeg.tobytes()
+        _frame_event.set()
+
+
+def update_frame(frame):
+    """Call from the CV loop to push the latest BGR/RGB frame (sent at native resolution).
+
+    Encoding happens on a worker thread so the CV loop never blocks on
+    libjpeg; if the encoder is still busy the stale queued frame is
+    replaced with the fresh one.
+    """
+    global _encoder_started
+    if not _encoder_started:
+        threading.Thread(target=_encode_loop, daemon=True,
+                         name="MJPEG-Encode").start()
+        _encoder_started = True
+    # Copy because callers reuse their frame buffers between iterations
+    frame = frame.copy()
+    try:
+        _encode_queue.put_nowait(frame)
+    except queue.Full:
+        try:
+            _encode_queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            _encode_queue.put_nowait(frame)
+        except queue.Full:
+            pass
 
 
 class _StreamHandler(BaseHTTPRequestHandler):
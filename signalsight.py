@@ -12,6 +12,7 @@ import os
 import time
 import threading
 import argparse
+import queue
 import signal
 from typing import Optional, Callable
 from dataclasses import dataclass
@@ -31,6 +32,17 @@ try:
 except ImportError:
     cv2 = None
 
+# Import the CV module once at startup (cv/ is on sys.path above).
+# Importing here instead of inside the worker thread means the heavy
+# torch/ultralytics setup happens before the first frame, cnn_system's
+# own SCRIPT_DIR-relative model paths make the old os.chdir dance
+# unnecessary, and a missing dependency surfaces at launch
+try:
+    import cnn_system
+except Exception as _cnn_err:
+    cnn_system = None
+    print(f"WARNING: CV module unavailable: {_cnn_err}")
+
 
 @dataclass
 class SystemState:
@@ -55,11 +67,24 @@ class ArduinoInterface:
         self.baudrate = baudrate
         self.no_arduino = no_arduino
         self.ser = None
-        self.lock = threading.Lock()
         self.connected = False
 
+        # Small bounded queue feeding a dedicated sender thread, so the
+        # blocking write/flush (flush waits for the UART to drain at
+        # 115200 baud) never runs on the coordination loop
+        self._tx_queue = queue.Queue(maxsize=4)
+        self._tx_thread = None
+
+        # Per-state message prefix, encoded once on first use - the
+        # handful of states repeat for the life of the process
+        self._state_prefix = {}
+
         if not no_arduino:
             self._connect()
+        if self.connected:
+            self._tx_thread = threading.Thread(
+                target=self._tx_loop, daemon=True, name="Arduino-TX")
+            self._tx_thread.start()
 
     def _connect(self):
         """Attempt to connect to Arduino."""
@@ -78,9 +103,34 @@ class ArduinoInterface:
             print(f"WARNING: Arduino not connected: {e}")
             print("   Running in no-data-send mode")
 
+    def _tx_loop(self):
+        """Dedicated sender thread: drains the queue down to the newest
+        message (stale states are worthless once a newer one exists),
+        then does the blocking write/flush off the coordination loop.
+        """
+        while self.connected and self.ser is not None:
+            try:
+                message = self._tx_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            # Keep only the newest pending message
+            try:
+                while True:
+                    message = self._tx_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                self.ser.write(message)
+                self.ser.flush()
+            except Exception as e:
+                print(f"WARNING: Arduino communication error: {e}")
+                self.connected = False
+                return
+
     def send_data(self, state: str, speed: int, distance: int) -> bool:
         """
-        Send complete data to Arduino. Thread-safe.
+        Queue data for the sender thread. Non-blocking.
 
         Format: STATE=ACTIVE_RED SPEED={speed} DIST={distance}\n
         Example: STATE=ACTIVE_RED SPEED=60 DIST=45\n
@@ -88,25 +138,37 @@ class ArduinoInterface:
         if not self.connected or self.ser is None or self.no_arduino:
             return False
 
-        with self.lock:
+        # Cached prefix + bytes %-formatting instead of building and
+        # UTF-8-encoding a fresh f-string per send
+        prefix = self._state_prefix.get(state)
+        if prefix is None:
+            prefix = f"STATE={state} SPEED=".encode('utf-8')
+            self._state_prefix[state] = prefix
+        message = prefix + b"%d DIST=%d\n" % (speed, distance)
+        try:
+            self._tx_queue.put_nowait(message)
+        except queue.Full:
+            # Sender is behind - drop the oldest entry, keep the newest
             try:
-                message = f"STATE={state} SPEED={speed} DIST={distance}\n"
-                self.ser.write(message.encode('utf-8'))
-                self.ser.flush()
-                return True
-            except Exception as e:
-                print(f"WARNING: Arduino communication error: {e}")
-                self.connected = False
-                return False
+                self._tx_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._tx_queue.put_nowait(message)
+            except queue.Full:
+                pass
+        return True
 
     def close(self):
         """Close serial connection."""
+        self.connected = False  # sender thread exits on next timeout
+        if self._tx_thread is not None and self._tx_thread.is_alive():
+            self._tx_thread.join(timeout=1)
         if self.ser is not None:
-            with self.lock:
-                try:
-                    self.ser.close()
-                except:
-                    pass
+            try:
+                self.ser.close()
+            except:
+                pass
 
 
 class CVModule:
@@ -134,20 +196,16 @@ class CVModule:
                 'confidence': cv_data['confidence'],
                 'fps': cv_data['fps']
             }
+        self.coordinator._wake.set()
 
     def _run(self):
-        """Run CV detection by importing and calling cnn_system.py."""
-        try:
-            # Save current directory
-            original_dir = os.getcwd()
-
-            # Change to CV module directory
-            os.chdir(os.path.join(SCRIPT_DIR, 'cv'))
-
-            # Import the actual CV module
-            sys.path.insert(0, os.getcwd())
-            import cnn_system
+        """Run CV detection via the pre-imported cnn_system module."""
+        if cnn_system is None:
+            print("ERROR: CV Module unavailable (cnn_system failed to import)")
+            print("CV detection will not be available")
+            return
 
+        try:
             if self.debug:
                 print("CV Module started (using cnn_system.py)")
 
@@ -159,9 +217,6 @@ class CVModule:
                 stop_event=self.stop_event
             )
 
-            # Restore directory
-            os.chdir(original_dir)
-
         except Exception as e:
             print(f"ERROR: CV Module Error: {e}")
             print("CV detection will not be available")
@@ -247,6 +302,7 @@ class GPSModule:
                         'nearby_lights': len(nearby),
                         'has_fix': position.fix_quality > 0
                     }
+                self.coordinator._wake.set()
 
             self.gps_system.set_position_callback(on_position_update)
 
@@ -278,6 +334,11 @@ class SignalSight:
         self.cv_state_lock = threading.Lock()
         self.latest_cv = None
         self.latest_gps = None
+        # Set by the CV/GPS callbacks so the coordination loop reacts
+        # to fresh data immediately instead of sleeping out its poll
+        # period; the wait timeout keeps the debug display ticking
+        self._wake = threading.Event()
+        self._last_debug_lines = None
         self.system_state = SystemState()
 
         # Display detection
@@ -404,18 +465,26 @@ class SignalSight:
                 if self.debug:
                     self._update_debug_display()
 
-                time.sleep(0.05)  # 20Hz update rate
+                # Wake immediately on a fresh CV/GPS update instead of
+                # sleeping out the poll period; cap at 20 Hz idle rate
+                self._wake.wait(timeout=0.05)
+                self._wake.clear()
 
             except KeyboardInterrupt:
                 break
 
     def _update_debug_display(self):
-        """Update debug display."""
+        """Update debug display. Skips the terminal rewrite (two ANSI
+        cursor moves plus a flush, 20x per second) when neither status
+        line actually changed."""
         CURSOR_UP = '\033[F'
         CLEAR_LINE = '\033[K'
 
         cv_line = self._format_cv_status()
         gps_line = self._format_gps_status()
+        if (cv_line, gps_line) == self._last_debug_lines:
+            return
+        self._last_debug_lines = (cv_line, gps_line)
 
         sys.stdout.write(f"{CURSOR_UP}{CURSOR_UP}")
         sys.stdout.write(f"{CLEAR_LINE}{cv_line}\n")
@@ -20,21 +20,43 @@ Keywords provided:
     - Check Device Path
 """
 
+import logging
+import select
+import threading
 import time
-import signal
+from functools import lru_cache
 from gps import gps, WATCH_ENABLE, WATCH_DISABLE
 from robot.api.deco import keyword
-from robot.api import logger
 
+# Standard logging (which Robot captures into its log) instead of
+# robot.api.logger: %-style arguments are only formatted when the
+# record is actually emitted, so suppressed levels cost nothing
+logger = logging.getLogger(__name__)
 
-class TimeoutException(Exception):
-    """Exception raised when operation times out"""
-    pass
+# Unit-conversion factors and memoized helpers for the pure-function
+# keywords. Data-driven suites call these with a small set of repeated
+# values, so after the first call the float parse + arithmetic/format
+# collapses to a cached dict lookup (args are passed as strings, which
+# is what Robot hands the keywords anyway)
+_MS_TO_KMH = 3.6
+_MS_TO_MPH = 2.23694
 
 
-def timeout_handler(signum, frame):
-    """Signal handler for timeout"""
-    raise TimeoutException("Operation timed out")
+@lru_cache(maxsize=1024)
+def _scale_speed(speed_ms, factor):
+    return float(speed_ms) * factor
+
+
+@lru_cache(maxsize=1024)
+def _fmt_coord(coordinate, decimal_places):
+    return f"{float(coordinate):.{decimal_places}f}"
+
+
+# Valid ranges per coordinate type, keyed by the lowercased type name
+_COORD_RANGES = {
+    'latitude': (-90.0, 90.0),
+    'longitude': (-180.0, 180.0),
+}
 
 
 class GPSLibrary:
@@ -47,6 +69,20 @@ class GPSLibrary:
         """Initialize GPS Library"""
         self.session = None
         self.connected = False
+        self._sock = None
+        # Single background reader drains gpsd into this shared state so
+        # the data keywords are O(1) lookups instead of competing polling
+        # loops that steal each other's reports off the socket
+        self._cv = threading.Condition()
+        self._stop = threading.Event()
+        self._reader = None
+        self._latest = {}  # report class -> most recent report
+        # Report classes seen since connect; a dict used as an ordered
+        # set so Get GPS Report Types returns arrival order instead of
+        # whatever iteration order the set hashes to
+        self._types = {}
+        self._last_report = None
+        self._report_seq = 0
         logger.info("GPS Library initialized")
 
     @keyword("Connect To GPSD")
@@ -62,11 +98,20 @@ class GPSLibrary:
         """
         try:
             self.session = gps(mode=WATCH_ENABLE)
+            self._sock = self.session.sock
+            self._latest = {}
+            self._types = {}
+            self._last_report = None
+            self._report_seq = 0
+            self._stop.clear()
             self.connected = True
+            self._reader = threading.Thread(
+                target=self._reader_loop, name="GPSD-Reader", daemon=True)
+            self._reader.start()
             logger.info("Successfully connected to GPSD")
             return True
         except Exception as e:
-            logger.error(f"Failed to connect to GPSD: {e}")
+            logger.error("Failed to connect to GPSD: %s", e)
             raise Exception(f"GPSD connection failed: {e}")
 
     @keyword("Disconnect From GPSD")
@@ -79,13 +124,23 @@ class GPSLibrary:
         """
         if self.session:
             try:
-                self.session = gps(mode=WATCH_DISABLE)
+                self._stop.set()
+                if self._reader is not None:
+                    self._reader.join(timeout=2)
+                    self._reader = None
+                # Disable the watch and close on the existing session -
+                # constructing gps(mode=WATCH_DISABLE) here opened a
+                # whole second TCP connection to gpsd just to say stop
+                self.session.stream(flags=WATCH_DISABLE)
+                self.session.close()
+                self.session = None
+                self._sock = None
                 self.connected = False
                 logger.info("Disconnected from GPSD")
             except Exception as e:
-                logger.warn(f"Error during disconnect: {e}")
+                logger.warning("Error during disconnect: %s", e)
         else:
-            logger.warn("No active GPS session to disconnect")
+            logger.warning("No active GPS session to disconnect")
 
     @keyword("GPSD Should Be Connected")
     def gpsd_should_be_connected(self):
@@ -119,39 +174,79 @@ class GPSLibrary:
         if not self.connected:
             raise Exception("Not connected to GPSD")
 
-        logger.info(f"Getting GPS report with {timeout}s timeout")
-        report = self._get_report_with_timeout(int(timeout))
+        logger.info("Getting GPS report with %ss timeout", timeout)
+        seq = self._report_seq
+        if self._wait_for(lambda: self._report_seq > seq, timeout):
+            report = self._last_report
+        else:
+            report = None
 
         if report:
-            logger.info(f"Received GPS report: class={report.get('class', 'unknown')}")
+            logger.info("Received GPS report: class=%s", report.get('class', 'unknown'))
             return report
         else:
-            logger.warn(f"No GPS report received within {timeout}s timeout")
+            logger.warning("No GPS report received within %ss timeout", timeout)
             return None
 
     def _get_report_with_timeout(self, timeout_seconds):
         """
         Internal method to get GPS report with timeout.
 
+        Waits on the gpsd socket with select() and only calls
+        session.next() once data is ready - no per-call SIGALRM
+        handler or alarm syscalls, and it works off the main thread
+        (signal.alarm does not).
+
+        Only the reader thread calls this; the keywords read the shared
+        state it maintains.
+
         Args:
-            timeout_seconds: Maximum time to wait
+            timeout_seconds: Maximum time to wait (accepts fractions)
 
         Returns:
             GPS report or None if timeout
         """
-        signal.signal(signal.SIGALRM, timeout_handler)
-        signal.alarm(timeout_seconds)
-
-        try:
-            report = self.session.next()
-            signal.alarm(0)  # Cancel alarm
-            return report
-        except TimeoutException:
-            signal.alarm(0)  # Cancel alarm
+        ready, _, _ = select.select([self._sock], [], [], timeout_seconds)
+        if not ready:
             return None
-        except Exception as e:
-            signal.alarm(0)  # Cancel alarm
-            raise e
+        return self.session.next()
+
+    def _reader_loop(self):
+        """Drain gpsd reports into the shared per-class snapshots.
+
+        One consumer of the socket means concurrent keywords no longer
+        discard reports meant for each other, and each data keyword
+        becomes a Condition.wait_for on state this loop maintains.
+        """
+        while not self._stop.is_set():
+            try:
+                report = self._get_report_with_timeout(0.5)
+            except (StopIteration, OSError):
+                break
+            if report is None:
+                continue
+            report_class = report.get('class') if report else None
+            with self._cv:
+                self._last_report = report
+                self._report_seq += 1
+                if report_class:
+                    self._latest[report_class] = report
+                    self._types[report_class] = None
+                self._cv.notify_all()
+
+    def _wait_for(self, predicate, timeout):
+        """Block until predicate() holds or the timeout elapses.
+
+        Condition.wait_for recomputes the remaining deadline after
+        every wakeup, so the declared timeout is exact - there is no
+        fixed-size inner wait that can overshoot it. Timeouts are taken
+        as floats, so fractional values like "2.5" work too.
+
+        Returns:
+            The final value of predicate()
+        """
+        with self._cv:
+            return self._cv.wait_for(predicate, float(timeout))
 
     @keyword("Get GPS Report Types")
     def get_gps_report_types(self, timeout=10):
@@ -171,17 +266,23 @@ class GPSLibrary:
         if not self.connected:
             raise Exception("Not connected to GPSD")
 
-        logger.info(f"Collecting GPS report types for {timeout}s")
-        received_types = set()
-        timeout_time = time.time() + int(timeout)
-
-        while time.time() < timeout_time:
-            report = self._get_report_with_timeout(2)
-            if report and 'class' in report:
-                received_types.add(report['class'])
-
-        result = list(received_types)
-        logger.info(f"Received report types: {result}")
+        logger.info("Collecting GPS report types for %ss", timeout)
+        # monotonic, not wall-clock: gpsd often disciplines the system
+        # clock on these rigs, and a backward time step mid-test would
+        # stretch a wall-clock deadline past the declared timeout
+        timeout_time = time.monotonic() + float(timeout)
+
+        # The reader accumulates types as reports arrive; just wait out
+        # the collection window, waking on each new report
+        with self._cv:
+            while True:
+                remaining = timeout_time - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cv.wait(remaining)
+            result = list(self._types)
+
+        logger.info("Received report types: %s", result)
         return result
 
     @keyword("Report Should Have Class Field")
@@ -203,7 +304,7 @@ class GPSLibrary:
             raise AssertionError("Report is None or empty")
         if 'class' not in report:
             raise AssertionError("Report does not have 'class' field")
-        logger.info(f"Report has class field: {report['class']}")
+        logger.info("Report has class field: %s", report['class'])
 
     @keyword("Get Report Of Type")
     def get_report_of_type(self, report_type, timeout=10):
@@ -223,16 +324,15 @@ class GPSLibrary:
         if not self.connected:
             raise Exception("Not connected to GPSD")
 
-        logger.info(f"Getting {report_type} report with {timeout}s timeout")
-        timeout_time = time.time() + int(timeout)
+        logger.info("Getting %s report with %ss timeout", report_type, timeout)
+        self._wait_for(lambda: report_type in self._latest, timeout)
+        report = self._latest.get(report_type)
 
-        while time.time() < timeout_time:
-            report = self._get_report_with_timeout(2)
-            if report and report.get('class') == report_type:
-                logger.info(f"Found {report_type} report")
-                return report
+        if report:
+            logger.info("Found %s report", report_type)
+            return report
 
-        logger.warn(f"No {report_type} report found within {timeout}s")
+        logger.warning("No %s report found within %ss", report_type, timeout)
         return None
 
     @keyword("Convert Speed MS To KMH")
@@ -250,9 +350,8 @@ class GPSLibrary:
             | ${kmh}= | Convert Speed MS To KMH | 10 |
             | Should Be Equal | ${kmh} | ${36.0} |
         """
-        speed_float = float(speed_ms)
-        kmh = speed_float * 3.6
-        logger.info(f"Converted {speed_ms} m/s to {kmh} km/h")
+        kmh = _scale_speed(str(speed_ms), _MS_TO_KMH)
+        logger.debug("Converted %s m/s to %s km/h", speed_ms, kmh)
         return kmh
 
     @keyword("Convert Speed MS To MPH")
@@ -269,9 +368,8 @@ class GPSLibrary:
         Example:
             | ${mph}= | Convert Speed MS To MPH | 10 |
         """
-        speed_float = float(speed_ms)
-        mph = speed_float * 2.23694
-        logger.info(f"Converted {speed_ms} m/s to {mph} mph")
+        mph = _scale_speed(str(speed_ms), _MS_TO_MPH)
+        logger.debug("Converted %s m/s to %s mph", speed_ms, mph)
         return mph
 
     @keyword("Format Coordinate")
@@ -289,9 +387,8 @@ class GPSLibrary:
         Example:
             | ${formatted}= | Format Coordinate | 40.7128 | 6 |
         """
-        coord_float = float(coordinate)
-        formatted = f"{coord_float:.{decimal_places}f}"
-        logger.info(f"Formatted coordinate: {formatted}")
+        formatted = _fmt_coord(str(coordinate), int(decimal_places))
+        logger.debug("Formatted coordinate: %s", formatted)
         return formatted
 
     @keyword("Get Satellite Data")
@@ -313,20 +410,22 @@ class GPSLibrary:
             raise Exception("Not connected to GPSD")
 
         logger.info("Getting satellite data")
-        timeout_time = time.time() + int(timeout)
-
-        while time.time() < timeout_time:
-            report = self._get_report_with_timeout(2)
-            if report and report.get('class') == 'SKY' and hasattr(report, 'satellites'):
-                satellites = report.satellites
-                sat_count = len(satellites)
-                used_count = sum(1 for sat in satellites if hasattr(sat, 'used') and sat.used)
-
-                result = {'total': sat_count, 'used': used_count}
-                logger.info(f"Satellite data: {result}")
-                return result
-
-        logger.warn(f"No satellite data found within {timeout}s")
+        self._wait_for(
+            lambda: hasattr(self._latest.get('SKY'), 'satellites'), timeout)
+        report = self._latest.get('SKY')
+
+        if report is not None and hasattr(report, 'satellites'):
+            satellites = report.satellites
+            sat_count = len(satellites)
+            # One getattr per satellite instead of hasattr + attribute
+            # access (hasattr is a full lookup with exception handling)
+            used_count = sum(1 for sat in satellites if getattr(sat, 'used', False))
+
+            result = {'total': sat_count, 'used': used_count}
+            logger.info("Satellite data: %s", result)
+            return result
+
+        logger.warning("No satellite data found within %ss", timeout)
         return None
 
     @keyword("Get Position Data")
@@ -348,21 +447,27 @@ class GPSLibrary:
             raise Exception("Not connected to GPSD")
 
         logger.info("Getting position data")
-        timeout_time = time.time() + int(timeout)
-
-        while time.time() < timeout_time:
-            report = self._get_report_with_timeout(2)
-            if report and report.get('class') == 'TPV':
-                if hasattr(report, 'lat') and hasattr(report, 'lon'):
-                    result = {
-                        'lat': report.lat,
-                        'lon': report.lon,
-                        'alt': report.alt if hasattr(report, 'alt') else None
-                    }
-                    logger.info(f"Position data: lat={result['lat']}, lon={result['lon']}")
-                    return result
-
-        logger.warn(f"No position fix found within {timeout}s")
+
+        # getattr with a None sentinel: one lookup per field instead of
+        # the hasattr + attribute-access double lookup
+        def _fix():
+            tpv = self._latest.get('TPV')
+            if tpv is None:
+                return None
+            lat = getattr(tpv, 'lat', None)
+            lon = getattr(tpv, 'lon', None)
+            if lat is None or lon is None:
+                return None
+            return {'lat': lat, 'lon': lon, 'alt': getattr(tpv, 'alt', None)}
+
+        self._wait_for(lambda: _fix() is not None, timeout)
+        result = _fix()
+
+        if result is not None:
+            logger.info("Position data: lat=%s, lon=%s", result['lat'], result['lon'])
+            return result
+
+        logger.warning("No position fix found within %ss", timeout)
         return None
 
     @keyword("Get GPS Mode")
@@ -390,16 +495,15 @@ class GPSLibrary:
             raise Exception("Not connected to GPSD")
 
         logger.info("Getting GPS mode")
-        timeout_time = time.time() + int(timeout)
+        self._wait_for(lambda: 'TPV' in self._latest, timeout)
+        report = self._latest.get('TPV')
 
-        while time.time() < timeout_time:
-            report = self._get_report_with_timeout(2)
-            if report and report.get('class') == 'TPV':
-                mode = report.get('mode', 0)
-                logger.info(f"GPS mode: {mode}")
-                return mode
+        if report is not None:
+            mode = report.get('mode', 0)
+            logger.info("GPS mode: %s", mode)
+            return mode
 
-        logger.warn(f"No GPS mode found within {timeout}s")
+        logger.warning("No GPS mode found within %ss", timeout)
         return 0
 
     @keyword("Get Device Path")
@@ -421,17 +525,25 @@ class GPSLibrary:
             raise Exception("Not connected to GPSD")
 
         logger.info("Getting device path")
-        timeout_time = time.time() + int(timeout)
 
-        while time.time() < timeout_time:
-            report = self._get_report_with_timeout(2)
-            if report and report.get('class') in ['TPV', 'SKY']:
-                if 'device' in report:
-                    device_path = report['device']
-                    logger.info(f"Device path: {device_path}")
-                    return device_path
+        def _find_device():
+            for report_class in ('TPV', 'SKY'):
+                report = self._latest.get(report_class)
+                if report:
+                    # Single .get instead of 'in' + subscript
+                    device = report.get('device')
+                    if device:
+                        return device
+            return None
+
+        self._wait_for(lambda: _find_device() is not None, timeout)
+        device_path = _find_device()
+
+        if device_path is not None:
+            logger.info("Device path: %s", device_path)
+            return device_path
 
-        logger.warn(f"No device path found within {timeout}s")
+        logger.warning("No device path found within %ss", timeout)
         return None
 
     @keyword("Coordinate Should Be Valid")
@@ -452,13 +564,14 @@ class GPSLibrary:
         """
         coord_float = float(coordinate)
 
-        if coord_type.lower() == 'latitude':
-            if coord_float < -90 or coord_float > 90:
-                raise AssertionError(f"Latitude {coord_float} out of range (-90 to 90)")
-        elif coord_type.lower() == 'longitude':
-            if coord_float < -180 or coord_float > 180:
-                raise AssertionError(f"Longitude {coord_float} out of range (-180 to 180)")
-        else:
+        # One dict lookup + one chained compare instead of the
+        # .lower() if/elif ladder on every call
+        try:
+            lo, hi = _COORD_RANGES[coord_type.lower()]
+        except KeyError:
             raise ValueError(f"Invalid coord_type: {coord_type}. Must be 'latitude' or 'longitude'")
+        if not lo <= coord_float <= hi:
+            raise AssertionError(
+                f"{coord_type.capitalize()} {coord_float} out of range ({lo:g} to {hi:g})")
 
-        logger.info(f"{coord_type.capitalize()} {coord_float} is valid")
+        logger.info("%s %s is valid", coord_type.capitalize(), coord_float)